@@ -13,6 +13,31 @@ class Settings(BaseSettings):
     WINDOW_ACTIVE_USERS: int = 300  # 5 mins
     WINDOW_PAGE_VIEWS: int = 900    # 15 mins
     WINDOW_SESSIONS: int = 300      # 5 mins
+    WINDOW_FUNNELS: int = 900       # 15 mins
+    WINDOW_SESSION_STATS: int = 900 # 15 mins
+    WINDOW_ROLLUPS: int = 900       # 15 mins
+    
+    # Quantile sketches: relative error of session duration/depth percentiles
+    SKETCH_RELATIVE_ACCURACY: float = 0.01
+    
+    # Funnels: name -> ordered URL path prefixes a session must visit
+    FUNNELS: dict[str, list[str]] = {"checkout": ["/products", "/cart", "/checkout"]}
+    # Per-session funnel progress expires after this much inactivity (seconds)
+    FUNNEL_STATE_TTL: int = 1800    # 30 mins
+    
+    # Rollups: dimensions pre-aggregated per minute (any subset can be grouped by)
+    ROLLUP_DIMENSIONS: list[str] = ["event_type", "url_group", "segment"]
+    # Max distinct values per dimension per minute; extra values fold into "other"
+    ROLLUP_CARDINALITY_CAP: int = 50
+    # URL path prefixes for the url_group dimension (longest prefix wins)
+    URL_GROUPS: list[str] = ["/home", "/products", "/cart", "/checkout", "/blog"]
+    
+    # De-duplication of client retries (events carrying an event_id)
+    DEDUP_ENABLED: bool = True
+    DEDUP_CAPACITY: int = 100000        # expected event_ids per filter bucket
+    DEDUP_ERROR_RATE: float = 0.001     # false-positive rate per filter
+    DEDUP_BUCKET_SECONDS: int = 300     # rotate to a fresh filter every 5 mins
+    DEDUP_BUCKETS: int = 2              # filters checked (current + previous)
     
     # Rate Limiting
     RATE_LIMIT_PER_SECOND: int = 50
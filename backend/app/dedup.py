@@ -0,0 +1,37 @@
+import hashlib
+import math
+
+class RotatingBloomFilter:
+    """
+    Time-bucketed Bloom filters stored as Redis bitmaps (SETBIT/GETBIT).
+
+    A new filter starts every `bucket_seconds`; lookups check the newest
+    `buckets` filters and older ones simply expire, so memory is bounded by
+    `buckets * size` bits no matter how many events flow through.
+    Sized so each filter holds `capacity` ids at `error_rate` false positives
+    (checking N filters gives roughly N * error_rate).
+    """
+    def __init__(self, capacity: int, error_rate: float, bucket_seconds: int, buckets: int,
+                 prefix: str = "analytics:dedup"):
+        self.size = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.prefix = prefix
+
+    @property
+    def ttl(self) -> int:
+        """Keep each bitmap until it rotates out of the lookup window"""
+        return self.bucket_seconds * self.buckets + 60
+
+    def positions(self, item: str) -> list[int]:
+        """Bit offsets for an item (Kirsch-Mitzenmacher double hashing)"""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def keys(self, now: float) -> list[str]:
+        """Bitmap keys to check, current (writable) bucket first"""
+        current = int(now // self.bucket_seconds) * self.bucket_seconds
+        return [f"{self.prefix}:{current - i * self.bucket_seconds}" for i in range(self.buckets)]
@@ -4,7 +4,7 @@ from fastapi.responses import JSONResponse
 import time
 import uuid
 import logging
-from .schemas import EventCreate, MetricResponse
+from .schemas import EventCreate, MetricResponse, FunnelResponse, BreakdownResponse
 from .redis_client import redis_client
 from .config import settings
 
@@ -92,13 +92,14 @@ async def ingest_event(event: EventCreate, _ = Depends(rate_limiter)):
     Accepts JSON events -> Validates -> Pushes to Redis Stream
     """
     # Create event payload
-    event_data = event.model_dump(mode='json')
+    # Optional fields that were not sent are left out of the stream entry
+    event_data = event.model_dump(mode='json', exclude_none=True)
     # Convert all values to strings for Redis Stream
     redis_data = {k: str(v) for k, v in event_data.items()}
 
     try:
         await redis_client.add_event(redis_data)
-        return {"status": "accepted", "id": str(uuid.uuid4())}
+        return {"status": "accepted", "id": event.event_id or str(uuid.uuid4())}
     except Exception as e:
         logger.error(f"Error ingesting event: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -113,17 +114,53 @@ async def get_metrics():
         active_sessions = await redis_client.get_active_sessions()
         top_pages = await redis_client.get_top_pages(5)
         avg_sessions = await redis_client.get_avg_sessions_active_user()
+        session_percentiles = await redis_client.get_session_percentiles()
 
         return MetricResponse(
             active_users=active_users,
             active_sessions=active_sessions,
             avg_sessions_per_user=avg_sessions,
-            top_pages=top_pages
+            top_pages=top_pages,
+            session_duration=session_percentiles["session_duration"],
+            session_depth=session_percentiles["session_depth"]
         )
     except Exception as e:
         logger.error(f"Error fetching metrics: {e}")
         raise HTTPException(status_code=500, detail="Error fetching metrics")
 
+@app.get("/metrics/funnels", response_model=FunnelResponse)
+async def get_funnel_metrics():
+    """
+    Reads windowed funnel step counts from Redis
+    """
+    try:
+        funnels = await redis_client.get_funnels()
+        return FunnelResponse(funnels=funnels)
+    except Exception as e:
+        logger.error(f"Error fetching funnel metrics: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching funnel metrics")
+
+@app.get("/metrics/breakdown", response_model=BreakdownResponse)
+async def get_breakdown(by: str = ""):
+    """
+    Event counts grouped by a comma-separated list of rollup dimensions,
+    e.g. ?by=event_type,url_group
+    """
+    dimensions = [d.strip() for d in by.split(",") if d.strip()]
+    unknown = [d for d in dimensions if d not in settings.ROLLUP_DIMENSIONS]
+    if not dimensions or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'by' must be a subset of {settings.ROLLUP_DIMENSIONS}"
+        )
+
+    try:
+        rows = await redis_client.get_breakdown(dimensions)
+        return BreakdownResponse(by=dimensions, rows=rows)
+    except Exception as e:
+        logger.error(f"Error fetching breakdown: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching breakdown")
+
 @app.get("/users/active")
 async def get_active_users_list():
     """
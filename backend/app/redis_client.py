@@ -1,5 +1,7 @@
+import json
 import redis.asyncio as redis
 from .config import settings
+from .sketch import QuantileSketch
 
 class RedisClient:
     def __init__(self):
@@ -25,21 +27,20 @@ class RedisClient:
         """Count sessions in the active window"""
         return await self.redis.zcard("analytics:sessions")
 
+    def _window_bucket_keys(self, prefix: str, window: int) -> list[str]:
+        """1-minute bucket keys covering [now - window, now], newest first"""
+        now = __import__("time").time()
+        current_minute = int(now // 60) * 60
+        # Include current minute and going back `window` seconds (e.g. 15 mins -> 16 keys)
+        return [f"{prefix}:{current_minute - (i * 60)}" for i in range(window // 60 + 1)]
+
     async def get_top_pages(self, limit: int = 5) -> dict[str, int]:
         """Get top pages by view count in the active window"""
         # OPTIMIZATION: Time Buckets
         # We read the last N 1-minute buckets and sum them up.
         # This is strictly O(buckets) which is very small (15 keys).
         
-        now = __import__("time").time()
-        current_minute = int(now // 60) * 60
-        
-        # Window is 15 mins. Generate keys for [now-15m, ..., now]
-        # We include current minute and going back 15 mins.
-        keys = []
-        for i in range(16): # 0 to 15
-            ts = current_minute - (i * 60)
-            keys.append(f"analytics:views:{ts}")
+        keys = self._window_bucket_keys("analytics:views", settings.WINDOW_PAGE_VIEWS)
             
         # Pipeline fetching all buckets
         pipe = self.redis.pipeline()
@@ -60,6 +61,92 @@ class RedisClient:
         sorted_pages = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:limit]
         return dict(sorted_pages)
 
+    async def get_funnels(self) -> list[dict]:
+        """Get per-step session counts and conversion for each configured funnel"""
+        # Same bucket strategy as top pages: O(funnels * buckets) reads, one pipeline.
+        pipe = self.redis.pipeline()
+        for name in settings.FUNNELS:
+            for key in self._window_bucket_keys(f"analytics:funnel:{name}", settings.WINDOW_FUNNELS):
+                pipe.hgetall(key)
+        
+        results = await pipe.execute()
+        
+        funnels = []
+        num_buckets = settings.WINDOW_FUNNELS // 60 + 1
+        for i, (name, steps) in enumerate(settings.FUNNELS.items()):
+            counts = [0] * len(steps)
+            for bucket_data in results[i * num_buckets:(i + 1) * num_buckets]:
+                if not bucket_data:
+                    continue
+                for step_index, count in bucket_data.items():
+                    step_index = int(step_index)
+                    if step_index < len(counts):
+                        counts[step_index] += int(count)
+            
+            funnel_steps = []
+            for j, (url, count) in enumerate(zip(steps, counts)):
+                previous = counts[j - 1] if j > 0 else count
+                funnel_steps.append({
+                    "url": url,
+                    "sessions": count,
+                    "conversion_rate": round(count / previous, 4) if previous else 0.0
+                })
+            
+            first, last = (counts[0], counts[-1]) if counts else (0, 0)
+            funnels.append({
+                "name": name,
+                "steps": funnel_steps,
+                "overall_conversion": round(last / first, 4) if first else 0.0
+            })
+        return funnels
+
+    async def get_session_percentiles(self) -> dict[str, dict[str, float]]:
+        """Get p50/p90/p99 of session duration (seconds) and depth (pages) in the window"""
+        # Each 1-minute bucket is a small sketch hash; merging ~15 of them is cheap.
+        metrics = ["session_duration", "session_depth"]
+        pipe = self.redis.pipeline()
+        for metric in metrics:
+            for key in self._window_bucket_keys(f"analytics:sketch:{metric}", settings.WINDOW_SESSION_STATS):
+                pipe.hgetall(key)
+        
+        results = await pipe.execute()
+        
+        percentiles = {}
+        num_buckets = settings.WINDOW_SESSION_STATS // 60 + 1
+        for i, metric in enumerate(metrics):
+            sketch = QuantileSketch(settings.SKETCH_RELATIVE_ACCURACY)
+            for bucket_data in results[i * num_buckets:(i + 1) * num_buckets]:
+                if bucket_data:
+                    sketch.merge(bucket_data)
+            percentiles[metric] = {
+                "p50": round(sketch.quantile(0.5), 2),
+                "p90": round(sketch.quantile(0.9), 2),
+                "p99": round(sketch.quantile(0.99), 2)
+            }
+        return percentiles
+
+    async def get_breakdown(self, by: list[str]) -> list[dict]:
+        """Group event counts in the window by the given rollup dimensions"""
+        # Each 1-minute rollup hash holds counts per full dimension combination,
+        # so any group-by is a projection + sum over ~15 small hashes.
+        pipe = self.redis.pipeline()
+        for key in self._window_bucket_keys("analytics:rollup", settings.WINDOW_ROLLUPS):
+            pipe.hgetall(key)
+        
+        results = await pipe.execute()
+        
+        counts = {}
+        for bucket_data in results:
+            if not bucket_data:
+                continue
+            for combination, count in bucket_data.items():
+                values = json.loads(combination)
+                group = tuple(values.get(d, "other") for d in by)
+                counts[group] = counts.get(group, 0) + int(count)
+        
+        rows = sorted(counts.items(), key=lambda x: x[1], reverse=True)
+        return [{"dimensions": dict(zip(by, group)), "count": count} for group, count in rows]
+
     async def get_user_session_count(self, user_id: str) -> int:
         """Get active session count for a specific user"""
         key = f"analytics:user_sessions:{user_id}"
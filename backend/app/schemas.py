@@ -1,4 +1,5 @@
 from pydantic import BaseModel, ConfigDict
+from typing import Optional
 from datetime import datetime
 
 class EventCreate(BaseModel):
@@ -7,6 +8,8 @@ class EventCreate(BaseModel):
     user_id: str
     session_id: str
     timestamp: datetime # ISO 8601 string or datetime object
+    segment: Optional[str] = None # e.g. traffic source or customer tier, used by rollups
+    event_id: Optional[str] = None # Client-generated id, reused on retries for de-duplication
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -25,3 +28,26 @@ class MetricResponse(BaseModel):
     active_sessions: int
     avg_sessions_per_user: float
     top_pages: dict[str, int]
+    session_duration: dict[str, float] # p50/p90/p99 in seconds
+    session_depth: dict[str, float]    # p50/p90/p99 in pages
+
+class FunnelStep(BaseModel):
+    url: str
+    sessions: int
+    conversion_rate: float # Relative to the previous step
+
+class FunnelMetric(BaseModel):
+    name: str
+    steps: list[FunnelStep]
+    overall_conversion: float # Last step / first step
+
+class FunnelResponse(BaseModel):
+    funnels: list[FunnelMetric]
+
+class BreakdownRow(BaseModel):
+    dimensions: dict[str, str]
+    count: int
+
+class BreakdownResponse(BaseModel):
+    by: list[str]
+    rows: list[BreakdownRow] # Sorted by count, descending
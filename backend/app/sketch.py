@@ -0,0 +1,55 @@
+import math
+
+class QuantileSketch:
+    """
+    DDSketch-style quantile sketch with a relative-error guarantee.
+
+    Values are mapped to logarithmic bins (bin i covers (gamma^(i-1), gamma^i]),
+    so any quantile estimate is within `relative_accuracy` of the true value.
+    Bins are plain counters: two sketches merge by adding counts per bin,
+    which means a Redis Hash updated with HINCRBY *is* the serialized sketch.
+    """
+    ZERO_BIN = "z"      # Values too small to log-bin (e.g. single-event sessions)
+    MIN_VALUE = 1e-3
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: dict[str, int] = {}
+        self.count = 0
+
+    def bin_for(self, value: float) -> str:
+        """Bin key (as stored in Redis) for a value"""
+        if value < self.MIN_VALUE:
+            return self.ZERO_BIN
+        return str(math.ceil(math.log(value) / self._log_gamma))
+
+    def value_for(self, bin_key: str) -> float:
+        """Representative value of a bin (midpoint in relative terms)"""
+        if bin_key == self.ZERO_BIN:
+            return 0.0
+        return 2 * self.gamma ** int(bin_key) / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        key = self.bin_for(value)
+        self.bins[key] = self.bins.get(key, 0) + count
+        self.count += count
+
+    def merge(self, bins: dict):
+        """Merge serialized bins (e.g. HGETALL result) into this sketch"""
+        for key, count in bins.items():
+            self.bins[key] = self.bins.get(key, 0) + int(count)
+            self.count += int(count)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        # Zero bin sorts first, then bins in increasing value order
+        ordered = sorted(self.bins, key=lambda k: -math.inf if k == self.ZERO_BIN else int(k))
+        seen = 0
+        for key in ordered:
+            seen += self.bins[key]
+            if seen > rank:
+                return self.value_for(key)
+        return self.value_for(ordered[-1])
@@ -0,0 +1,40 @@
+from urllib.parse import urlsplit
+
+class UrlGroupTrie:
+    """
+    Maps a page URL to its configured group by longest path-prefix match.
+
+    Prefixes are compiled into a trie keyed by path segment, so a lookup costs
+    O(path depth) regardless of how many groups are configured.
+    "/products" matches "/products/shoes" but not "/productsale".
+    """
+    OTHER = "other"
+
+    def __init__(self, prefixes: list[str]):
+        # Children live in their own dict so no URL segment can collide with the group marker
+        self.root = self._node()
+        for prefix in prefixes:
+            node = self.root
+            for segment in self._segments(prefix):
+                node = node["children"].setdefault(segment, self._node())
+            node["group"] = prefix
+
+    @staticmethod
+    def _node() -> dict:
+        return {"children": {}, "group": None}
+
+    @staticmethod
+    def _segments(url: str) -> list[str]:
+        # Accept both paths and absolute URLs; ignore query strings
+        path = urlsplit(url).path
+        return [s for s in path.split("/") if s]
+
+    def group(self, url: str) -> str:
+        node = self.root
+        match = node["group"] or self.OTHER
+        for segment in self._segments(url):
+            node = node["children"].get(segment)
+            if node is None:
+                break
+            match = node["group"] or match
+        return match
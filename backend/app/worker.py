@@ -2,8 +2,12 @@ import asyncio
 import logging
 import time
 import json
+from urllib.parse import urlsplit
 from .config import settings
 from .redis_client import redis_client
+from .sketch import QuantileSketch
+from .url_groups import UrlGroupTrie
+from .dedup import RotatingBloomFilter
 from prometheus_client import start_http_server, Counter, Gauge
 
 # Prometheus Metrics
@@ -11,6 +15,31 @@ EVENTS_PROCESSED = Counter('events_processed_total', 'Total number of events pro
 PROCESSING_ERRORS = Counter('processing_errors_total', 'Total number of errors during event processing')
 ACTIVE_USERS = Gauge('active_users', 'Number of active users in the last 5 minutes')
 ACTIVE_SESSIONS = Gauge('active_sessions', 'Number of active sessions in the last 5 minutes')
+DUPLICATES_DROPPED = Counter('duplicate_events_dropped_total', 'Total number of events dropped as duplicates by event_id')
+DEDUP_FILTER_FILL = Gauge('dedup_filter_fill_ratio', 'Fraction of bits set in the current de-duplication Bloom filter')
+SESSIONS_COMPLETED = Counter('sessions_completed_total', 'Total number of expired sessions added to quantile sketches')
+
+# Session stats keep the earliest/latest event timestamp, not first/last processed:
+# client timestamps can arrive out of order. Atomic min/max in one round trip.
+SESSION_BOUNDS_SCRIPT = """
+local ts = tonumber(ARGV[1])
+local first = tonumber(redis.call('HGET', KEYS[1], 'first'))
+local last = tonumber(redis.call('HGET', KEYS[1], 'last'))
+if not first or ts < first then redis.call('HSET', KEYS[1], 'first', ARGV[1]) end
+if not last or ts > last then redis.call('HSET', KEYS[1], 'last', ARGV[1]) end
+"""
+
+# Only used to map values to sketch bins; counts live in Redis
+SESSION_SKETCH = QuantileSketch(settings.SKETCH_RELATIVE_ACCURACY)
+
+URL_GROUPS = UrlGroupTrie(settings.URL_GROUPS)
+
+DEDUP_FILTER = RotatingBloomFilter(
+    settings.DEDUP_CAPACITY,
+    settings.DEDUP_ERROR_RATE,
+    settings.DEDUP_BUCKET_SECONDS,
+    settings.DEDUP_BUCKETS
+)
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +60,76 @@ async def create_consumer_group():
         else:
             logger.error(f"Error creating consumer group: {e}")
 
+def matches_step(page_url, step):
+    """Path-prefix match: "/cart" matches "/cart" and "/cart/items" but not "/cartoon"."""
+    # Compare paths only, like UrlGroupTrie: ignore scheme, host and query string
+    path = urlsplit(page_url).path
+    return path == step or path.startswith(step.rstrip("/") + "/")
+
+def advance_funnel(steps, completed, page_url):
+    """
+    Funnel state machine: a session that has completed `completed` steps
+    moves on only when it visits the next step in order.
+    Returns the new number of completed steps.
+    """
+    if completed < len(steps) and matches_step(page_url, steps[completed]):
+        return completed + 1
+    return completed
+
+class CardinalityLimiter:
+    """
+    Caps distinct values per rollup dimension per minute bucket.
+    Values past the cap are folded into "other", bounding rollup hash size.
+    """
+    def __init__(self, cap, window):
+        self.cap = cap
+        self.window = window
+        self.seen = {} # bucket_ts -> {dimension: set of values}
+
+    def limit(self, dimension, value, bucket_ts, now=None):
+        if bucket_ts not in self.seen:
+            # Event timestamps come from clients, so evict by wall clock: a bogus
+            # far-future bucket can't freeze the current minute's sets
+            now = time.time() if now is None else now
+            self.seen = {
+                ts: dims for ts, dims in self.seen.items()
+                if now - self.window <= ts <= now + self.window
+            }
+            self.seen[bucket_ts] = {}
+        values = self.seen[bucket_ts].setdefault(dimension, set())
+        if value in values:
+            return value
+        if len(values) >= self.cap:
+            return "other"
+        values.add(value)
+        return value
+
+ROLLUP_LIMITER = CardinalityLimiter(settings.ROLLUP_CARDINALITY_CAP, settings.WINDOW_ROLLUPS)
+
+def rollup_field(event_data, bucket_ts):
+    """Encode the event's configured dimension values as a rollup hash field"""
+    values = {
+        "event_type": event_data.get("event_type") or "unknown",
+        "url_group": URL_GROUPS.group(event_data.get("page_url") or ""),
+        "segment": event_data.get("segment") or "none",
+    }
+    combination = {
+        dim: ROLLUP_LIMITER.limit(dim, values.get(dim, "unknown"), bucket_ts)
+        for dim in settings.ROLLUP_DIMENSIONS
+    }
+    return json.dumps(combination, sort_keys=True, separators=(",", ":"))
+
+async def is_duplicate(dedup_keys, positions):
+    """Check an event_id's bits against every active Bloom filter in one pipeline"""
+    pipe = redis_client.redis.pipeline()
+    for key in dedup_keys:
+        for position in positions:
+            pipe.getbit(key, position)
+    bits = await pipe.execute()
+    
+    k = len(positions)
+    return any(all(bits[i * k:(i + 1) * k]) for i in range(len(dedup_keys)))
+
 async def process_event(event_id, event_data):
     """
     Update metrics in Redis sorted sets.
@@ -56,6 +155,45 @@ async def process_event(event_id, event_data):
         session_id = event_data.get("session_id")
         page_url = event_data.get("page_url")
         event_type = event_data.get("event_type")
+        client_event_id = event_data.get("event_id")
+        
+        # De-duplication: client retries / redelivered entries carry the same event_id.
+        # Filters rotate on arrival time, since retries arrive close together.
+        dedup_positions = []
+        if client_event_id and settings.DEDUP_ENABLED:
+            dedup_keys = DEDUP_FILTER.keys(time.time())
+            dedup_positions = DEDUP_FILTER.positions(client_event_id)
+            if await is_duplicate(dedup_keys, dedup_positions):
+                DUPLICATES_DROPPED.inc()
+                EVENTS_PROCESSED.labels(status="duplicate", event_type=event_type or "unknown").inc()
+                return True # Ack it: the original was already counted
+        
+        # Calculate bucket timestamp (floor to nearest minute)
+        bucket_ts = int(timestamp // 60) * 60
+        
+        # Funnels: read this session's compact step state before writing.
+        # State is one small hash per session (funnel -> completed steps, plus
+        # "<funnel>:start" -> entry bucket) with a TTL, so memory stays bounded
+        # by the number of recently active sessions.
+        funnel_state_key = f"analytics:funnel_state:{session_id}"
+        funnel_state = {}
+        funnel_updates = {}
+        funnel_credits = {}
+        if session_id and page_url and event_type == "page_view" and settings.FUNNELS:
+            funnel_state = await redis_client.redis.hgetall(funnel_state_key)
+            for name, steps in settings.FUNNELS.items():
+                completed = int(funnel_state.get(name, 0))
+                new_completed = advance_funnel(steps, completed, page_url)
+                if new_completed > completed:
+                    funnel_updates[name] = new_completed
+                    if completed == 0:
+                        funnel_updates[f"{name}:start"] = bucket_ts
+                    # Cohort counting: every step is credited to the bucket the session
+                    # entered the funnel in, so a window never counts a later step
+                    # without the earlier ones (conversion stays <= 1.0)
+                    entry_bucket = int(funnel_state.get(f"{name}:start", bucket_ts))
+                    if entry_bucket >= bucket_ts - settings.WINDOW_FUNNELS:
+                        funnel_credits[name] = (entry_bucket, new_completed)
         
         pipe = redis_client.redis.pipeline()
         
@@ -69,9 +207,6 @@ async def process_event(event_id, event_data):
             # OPTIMIZATION: Time Buckets
             # Instead of storing every single event in a ZSET (O(N) memory),
             # we aggregate counts into small 1-minute buckets (O(buckets * pages) memory).
-            
-            # Calculate bucket timestamp (floor to nearest minute)
-            bucket_ts = int(timestamp // 60) * 60
             bucket_key = f"analytics:views:{bucket_ts}"
             
             # Increment count for this page in this bucket
@@ -91,6 +226,37 @@ async def process_event(event_id, event_data):
                  pipe.zadd(u_key, {session_id: timestamp})
                  # Window is 5 mins (300s) + 5 mins buffer
                  pipe.expire(u_key, settings.WINDOW_SESSIONS + 300)
+            
+            # Session stats: first/last seen and page depth, flushed into sketches on expiry
+            s_key = f"analytics:session_stats:{session_id}"
+            pipe.eval(SESSION_BOUNDS_SCRIPT, 1, s_key, timestamp)
+            if event_type == "page_view":
+                pipe.hincrby(s_key, "pages", 1)
+            pipe.expire(s_key, settings.WINDOW_SESSIONS + 300)
+
+        # 3. Rollups: one counter per dimension combination per minute (every event type)
+        rollup_key = f"analytics:rollup:{bucket_ts}"
+        pipe.hincrby(rollup_key, rollup_field(event_data, bucket_ts), 1)
+        pipe.expire(rollup_key, settings.WINDOW_ROLLUPS + 300)
+
+        # 4. Funnels: count each session once per step, in its entry (cohort) bucket
+        if funnel_updates:
+            pipe.hset(funnel_state_key, mapping=funnel_updates)
+            for name, (entry_bucket, completed) in funnel_credits.items():
+                # Field = index of the step just reached
+                f_key = f"analytics:funnel:{name}:{entry_bucket}"
+                pipe.hincrby(f_key, str(completed - 1), 1)
+                pipe.expire(f_key, settings.WINDOW_FUNNELS + 300)
+        if funnel_updates or funnel_state:
+            # Sliding TTL: idle sessions drop their funnel progress
+            pipe.expire(funnel_state_key, settings.FUNNEL_STATE_TTL)
+
+        # 5. Mark event_id as seen in the same pipeline (MULTI/EXEC) as the counters,
+        # so a crash can't leave an event counted but unmarked (or vice versa).
+        if dedup_positions:
+            for position in dedup_positions:
+                pipe.setbit(dedup_keys[0], position, 1)
+            pipe.expire(dedup_keys[0], DEDUP_FILTER.ttl)
 
         await pipe.execute()
         
@@ -104,6 +270,47 @@ async def process_event(event_id, event_data):
         EVENTS_PROCESSED.labels(status="error", event_type=event_type or "unknown").inc()
         return False
 
+async def flush_expired_sessions(session_ids, now):
+    """
+    Move expired sessions' duration and page depth into the current
+    1-minute quantile sketches, then drop their per-session stats.
+    """
+    pipe = redis_client.redis.pipeline()
+    for session_id in session_ids:
+        pipe.hgetall(f"analytics:session_stats:{session_id}")
+    all_stats = await pipe.execute()
+    
+    cutoff = now - settings.WINDOW_SESSIONS
+    bucket_ts = int(now // 60) * 60
+    duration_key = f"analytics:sketch:session_duration:{bucket_ts}"
+    depth_key = f"analytics:sketch:session_depth:{bucket_ts}"
+    
+    pipe = redis_client.redis.pipeline()
+    flushed = []
+    for session_id, stats in zip(session_ids, all_stats):
+        if not stats or "first" not in stats:
+            continue
+        last = float(stats.get("last", stats["first"]))
+        if last > cutoff:
+            # Refreshed by process_event since the expiry scan: still active
+            continue
+        duration = max(0.0, last - float(stats["first"]))
+        pages = int(stats.get("pages", 0))
+        # Sketch bins are counters, so HINCRBY merges this session into the bucket
+        pipe.hincrby(duration_key, SESSION_SKETCH.bin_for(duration), 1)
+        pipe.hincrby(depth_key, SESSION_SKETCH.bin_for(pages), 1)
+        pipe.delete(f"analytics:session_stats:{session_id}")
+        flushed.append(session_id)
+    
+    if flushed:
+        # Remove exactly the flushed members (not by score), so a session refreshed
+        # while we were flushing can't stay active and be recorded a second time
+        pipe.zrem("analytics:sessions", *flushed)
+        pipe.expire(duration_key, settings.WINDOW_SESSION_STATS + 300)
+        pipe.expire(depth_key, settings.WINDOW_SESSION_STATS + 300)
+        await pipe.execute()
+        SESSIONS_COMPLETED.inc(len(flushed))
+
 async def prune_old_data():
     """
     Periodically remove old entries from running ZSETs.
@@ -113,6 +320,13 @@ async def prune_old_data():
         try:
             now = time.time()
             
+            # Sessions about to be pruned are complete: record them in the sketches first
+            expired_sessions = await redis_client.redis.zrangebyscore(
+                "analytics:sessions", "-inf", now - settings.WINDOW_SESSIONS
+            )
+            if expired_sessions:
+                await flush_expired_sessions(expired_sessions, now)
+            
             pipe = redis_client.redis.pipeline()
             
             # Prune Active Users (< now - 300s)
@@ -129,6 +343,9 @@ async def prune_old_data():
                 sessions_count = await redis_client.get_active_sessions()
                 ACTIVE_USERS.set(users_count)
                 ACTIVE_SESSIONS.set(sessions_count)
+                if settings.DEDUP_ENABLED:
+                    bits_set = await redis_client.redis.bitcount(DEDUP_FILTER.keys(now)[0])
+                    DEDUP_FILTER_FILL.set(bits_set / DEDUP_FILTER.size)
             except Exception as e:
                 logger.error(f"Error updating gauges: {e}")
             
@@ -0,0 +1,20 @@
+from app.dedup import RotatingBloomFilter
+
+def test_sizing_from_capacity_and_error_rate():
+    bloom = RotatingBloomFilter(capacity=100000, error_rate=0.001, bucket_seconds=300, buckets=2)
+    # m = -n ln(p) / ln(2)^2 ~ 14.4 bits per item, k = m/n ln(2) ~ 10 hashes
+    assert bloom.size == 1437759
+    assert bloom.hash_count == 10
+
+def test_positions_are_stable_and_in_range():
+    bloom = RotatingBloomFilter(capacity=1000, error_rate=0.01, bucket_seconds=300, buckets=2)
+    positions = bloom.positions("evt_123")
+    assert positions == bloom.positions("evt_123")
+    assert positions != bloom.positions("evt_124")
+    assert len(positions) == bloom.hash_count
+    assert all(0 <= p < bloom.size for p in positions)
+
+def test_keys_rotate_by_bucket():
+    bloom = RotatingBloomFilter(capacity=1000, error_rate=0.01, bucket_seconds=300, buckets=2)
+    assert bloom.keys(1000) == ["analytics:dedup:900", "analytics:dedup:600"]
+    assert bloom.keys(1250)[0] == "analytics:dedup:1200"
@@ -33,6 +33,28 @@ async def test_ingest_event():
         assert data["status"] == "accepted"
         assert "id" in data
 
+@pytest.mark.asyncio
+async def test_ingest_event_echoes_event_id():
+    with patch("app.main.redis_client", new_callable=AsyncMock) as mock_redis:
+        mock_pipeline = MagicMock()
+        mock_pipeline.execute = AsyncMock(return_value=[1])
+        mock_redis.redis.pipeline = MagicMock(return_value=mock_pipeline)
+        mock_redis.add_event = AsyncMock()
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/ingest", json={
+                "event_id": "evt_42",
+                "event_type": "page_view",
+                "page_url": "/cart",
+                "user_id": "test_user",
+                "session_id": "test_session",
+                "timestamp": "2024-03-15T12:00:00Z"
+            })
+        assert response.status_code == 202
+        assert response.json()["id"] == "evt_42"
+        # Retries reuse the id, so it travels with the event to the worker
+        assert mock_redis.add_event.await_args.args[0]["event_id"] == "evt_42"
+
 @pytest.mark.asyncio
 async def test_get_metrics_empty():
     # Mock redis_client methods
@@ -41,6 +63,11 @@ async def test_get_metrics_empty():
         mock_redis.get_active_sessions = AsyncMock(return_value=0)
         mock_redis.get_avg_sessions_active_user = AsyncMock(return_value=0.0)
         mock_redis.get_top_pages = AsyncMock(return_value={})
+        empty = {"p50": 0.0, "p90": 0.0, "p99": 0.0}
+        mock_redis.get_session_percentiles = AsyncMock(return_value={
+            "session_duration": empty,
+            "session_depth": empty
+        })
         
         async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
             response = await ac.get("/metrics")
@@ -50,3 +77,45 @@ async def test_get_metrics_empty():
         assert data["active_users"] == 0
         assert data["active_sessions"] == 0
         assert data["top_pages"] == {}
+        assert data["session_duration"] == {"p50": 0.0, "p90": 0.0, "p99": 0.0}
+
+@pytest.mark.asyncio
+async def test_get_funnel_metrics():
+    with patch("app.main.redis_client") as mock_redis:
+        mock_redis.get_funnels = AsyncMock(return_value=[{
+            "name": "checkout",
+            "steps": [
+                {"url": "/products", "sessions": 4, "conversion_rate": 1.0},
+                {"url": "/cart", "sessions": 2, "conversion_rate": 0.5},
+            ],
+            "overall_conversion": 0.5
+        }])
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/metrics/funnels")
+        
+        assert response.status_code == 200
+        funnel = response.json()["funnels"][0]
+        assert funnel["name"] == "checkout"
+        assert [s["sessions"] for s in funnel["steps"]] == [4, 2]
+        assert funnel["overall_conversion"] == 0.5
+
+@pytest.mark.asyncio
+async def test_get_breakdown():
+    with patch("app.main.redis_client") as mock_redis:
+        mock_redis.get_breakdown = AsyncMock(return_value=[
+            {"dimensions": {"url_group": "/products"}, "count": 9}
+        ])
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/metrics/breakdown", params={"by": "url_group"})
+            bad_response = await ac.get("/metrics/breakdown", params={"by": "country"})
+            missing_response = await ac.get("/metrics/breakdown")
+        
+        assert response.status_code == 200
+        assert response.json() == {"by": ["url_group"], "rows": [{"dimensions": {"url_group": "/products"}, "count": 9}]}
+        mock_redis.get_breakdown.assert_awaited_once_with(["url_group"])
+        assert bad_response.status_code == 400
+        # A missing 'by' is a bad read request, not an ingest validation error for the DLQ
+        assert missing_response.status_code == 400
+        mock_redis.add_dlq_event.assert_not_called()
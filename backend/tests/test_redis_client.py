@@ -1,5 +1,6 @@
 import pytest
 from app.redis_client import RedisClient
+from app.sketch import QuantileSketch
 
 # We need a running Redis for integration tests, or mock it.
 # Since we are running in docker, we might have access to redis service.
@@ -43,3 +44,86 @@ async def test_get_top_pages():
         client = RedisClient()      
         pages = await client.get_top_pages(limit=5)
         assert pages == {"url1": 12, "url2": 5, "url3": 1}
+
+@pytest.mark.asyncio
+async def test_get_funnels():
+    with patch("redis.asyncio.from_url") as mock_redis_cls, \
+         patch("app.redis_client.settings.FUNNELS", {"checkout": ["/products", "/cart", "/checkout"]}):
+        mock_redis = AsyncMock()
+        mock_redis_cls.return_value = mock_redis
+        
+        mock_pipeline = MagicMock()
+        mock_redis.pipeline = MagicMock(return_value=mock_pipeline)
+        mock_pipeline.hgetall.return_value = mock_pipeline
+        
+        # One hash per 1-minute bucket: step index -> sessions reaching that step
+        buckets = [{"0": "6", "1": "2"}, {"0": "4", "1": "3", "2": "1"}]
+        buckets += [{}] * 14
+        mock_pipeline.execute = AsyncMock(return_value=buckets)
+        
+        client = RedisClient()
+        funnels = await client.get_funnels()
+        assert mock_pipeline.hgetall.call_count == 16
+        assert funnels == [{
+            "name": "checkout",
+            "steps": [
+                {"url": "/products", "sessions": 10, "conversion_rate": 1.0},
+                {"url": "/cart", "sessions": 5, "conversion_rate": 0.5},
+                {"url": "/checkout", "sessions": 1, "conversion_rate": 0.2},
+            ],
+            "overall_conversion": 0.1
+        }]
+
+@pytest.mark.asyncio
+async def test_get_session_percentiles():
+    with patch("redis.asyncio.from_url") as mock_redis_cls:
+        mock_redis = AsyncMock()
+        mock_redis_cls.return_value = mock_redis
+        
+        mock_pipeline = MagicMock()
+        mock_redis.pipeline = MagicMock(return_value=mock_pipeline)
+        mock_pipeline.hgetall.return_value = mock_pipeline
+        
+        # 16 duration buckets then 16 depth buckets, each a serialized sketch
+        duration = QuantileSketch()
+        for v in [10, 20, 30, 40, 50]:
+            duration.add(v)
+        depth = QuantileSketch()
+        depth.add(3, count=4)
+        buckets = [duration.bins] + [{}] * 15 + [depth.bins] + [{}] * 15
+        mock_pipeline.execute = AsyncMock(return_value=buckets)
+        
+        client = RedisClient()
+        percentiles = await client.get_session_percentiles()
+        assert mock_pipeline.hgetall.call_count == 32
+        assert percentiles["session_duration"]["p50"] == pytest.approx(30, rel=0.01)
+        assert percentiles["session_duration"]["p90"] == pytest.approx(40, rel=0.01)
+        assert percentiles["session_depth"]["p90"] == pytest.approx(3, rel=0.01)
+
+@pytest.mark.asyncio
+async def test_get_breakdown():
+    with patch("redis.asyncio.from_url") as mock_redis_cls:
+        mock_redis = AsyncMock()
+        mock_redis_cls.return_value = mock_redis
+        
+        mock_pipeline = MagicMock()
+        mock_redis.pipeline = MagicMock(return_value=mock_pipeline)
+        mock_pipeline.hgetall.return_value = mock_pipeline
+        
+        # Rollup buckets: full dimension combination -> count
+        mock_pipeline.execute = AsyncMock(return_value=[
+            {
+                '{"event_type":"page_view","segment":"none","url_group":"/products"}': "7",
+                '{"event_type":"click","segment":"none","url_group":"/products"}': "2",
+            },
+            {
+                '{"event_type":"page_view","segment":"ads","url_group":"/blog"}': "4",
+            },
+        ])
+        
+        client = RedisClient()
+        rows = await client.get_breakdown(["event_type"])
+        assert rows == [
+            {"dimensions": {"event_type": "page_view"}, "count": 11},
+            {"dimensions": {"event_type": "click"}, "count": 2},
+        ]
@@ -0,0 +1,28 @@
+import pytest
+from app.sketch import QuantileSketch
+
+def test_quantiles_within_relative_accuracy():
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for v in range(1, 1001):
+        sketch.add(v)
+    for q, expected in [(0.5, 500), (0.9, 900), (0.99, 990)]:
+        assert sketch.quantile(q) == pytest.approx(expected, rel=0.02)
+
+def test_merge_serialized_bins():
+    # Merging Redis-style {bin: "count"} hashes equals adding all values to one sketch
+    a, b, combined = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for v in [0, 1, 5, 30]:
+        a.add(v)
+        combined.add(v)
+    for v in [60, 120, 600]:
+        b.add(v)
+        combined.add(v)
+    merged = QuantileSketch()
+    merged.merge({k: str(c) for k, c in a.bins.items()})
+    merged.merge({k: str(c) for k, c in b.bins.items()})
+    assert merged.count == 7
+    assert merged.bins == combined.bins
+    assert merged.quantile(0.0) == 0.0
+
+def test_empty_sketch():
+    assert QuantileSketch().quantile(0.5) == 0.0
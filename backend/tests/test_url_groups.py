@@ -0,0 +1,19 @@
+from app.url_groups import UrlGroupTrie
+
+def test_longest_prefix_wins():
+    trie = UrlGroupTrie(["/products", "/products/electronics", "/blog"])
+    assert trie.group("/products/shoes") == "/products"
+    assert trie.group("/products/electronics/tv") == "/products/electronics"
+    assert trie.group("/blog/news?ref=home") == "/blog"
+
+def test_unmatched_and_partial_segments():
+    trie = UrlGroupTrie(["/products", "/cart"])
+    assert trie.group("/cartoon") == "other"
+    assert trie.group("/") == "other"
+    assert trie.group("http://example.com/cart") == "/cart"
+
+def test_segments_cannot_collide_with_trie_internals():
+    trie = UrlGroupTrie(["/products"])
+    assert trie.group("/products/__group__") == "/products"
+    assert trie.group("/products/children/group") == "/products"
+    assert trie.group("/children") == "other"
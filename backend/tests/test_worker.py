@@ -0,0 +1,171 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, patch, MagicMock
+from app.worker import advance_funnel, matches_step, CardinalityLimiter, rollup_field, process_event, DEDUP_FILTER, flush_expired_sessions, SESSION_SKETCH, SESSION_BOUNDS_SCRIPT
+
+STEPS = ["/products", "/cart", "/checkout"]
+
+def test_matches_step_is_path_prefix():
+    assert matches_step("/products/shoes", "/products")
+    assert matches_step("/cart", "/cart")
+    assert not matches_step("/cartoon", "/cart")
+    assert matches_step("/cart?item=1", "/cart")
+    assert matches_step("http://shop.example/cart", "/cart")
+
+def test_advance_funnel_in_order():
+    completed = 0
+    for url in ["/home", "/products/shoes", "/blog/news", "/cart", "/checkout"]:
+        completed = advance_funnel(STEPS, completed, url)
+    assert completed == 3
+
+def test_advance_funnel_skipping_step_does_not_advance():
+    # Going straight to /cart without a product view does not count
+    assert advance_funnel(STEPS, 0, "/cart") == 0
+    # Completed funnels stay completed
+    assert advance_funnel(STEPS, 3, "/products/shoes") == 3
+
+def test_cardinality_limiter_folds_excess_values():
+    limiter = CardinalityLimiter(cap=2, window=900)
+    assert limiter.limit("segment", "a", 60, now=60) == "a"
+    assert limiter.limit("segment", "b", 60, now=60) == "b"
+    assert limiter.limit("segment", "c", 60, now=60) == "other"
+    # Known values still pass; caps are per dimension
+    assert limiter.limit("segment", "a", 60, now=60) == "a"
+    assert limiter.limit("event_type", "click", 60, now=60) == "click"
+    # A new minute has its own cap
+    assert limiter.limit("segment", "c", 120, now=120) == "c"
+
+def test_cardinality_limiter_ignores_future_buckets():
+    limiter = CardinalityLimiter(cap=2, window=900)
+    now = 1710504000
+    future = 4102444800 # 2100-01-01, client-supplied timestamp
+    assert limiter.limit("segment", "x", future, now=now) == "x"
+    # The current minute still admits new values
+    assert [limiter.limit("segment", v, now, now=now) for v in ["a", "b", "c"]] == ["a", "b", "other"]
+    later = now + 600
+    assert [limiter.limit("segment", v, later, now=later) for v in ["d", "e"]] == ["d", "e"]
+    # Buckets outside the window around the wall clock are evicted
+    assert set(limiter.seen) == {now, later}
+
+def test_rollup_field_encodes_configured_dimensions():
+    field = rollup_field({"event_type": "page_view", "page_url": "/products/shoes"}, 60)
+    assert json.loads(field) == {"event_type": "page_view", "url_group": "/products", "segment": "none"}
+
+@pytest.mark.asyncio
+async def test_process_event_drops_duplicate_event_id():
+    with patch("app.worker.redis_client") as mock_redis:
+        mock_pipeline = MagicMock()
+        mock_redis.redis.pipeline = MagicMock(return_value=mock_pipeline)
+        # Every bit already set in the current filter -> seen before
+        mock_pipeline.execute = AsyncMock(return_value=[1] * DEDUP_FILTER.hash_count * DEDUP_FILTER.buckets)
+        mock_redis.redis.hgetall = AsyncMock(return_value={})
+        
+        processed = await process_event("1-0", {
+            "event_id": "evt_1",
+            "event_type": "page_view",
+            "page_url": "/cart",
+            "user_id": "u1",
+            "session_id": "s1",
+            "timestamp": "2024-03-15T12:00:00Z"
+        })
+        
+        # Acked, but only the dedup lookup ran: no counters were written
+        assert processed is True
+        assert mock_pipeline.execute.await_count == 1
+        mock_pipeline.hincrby.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_process_event_records_session_stats():
+    with patch("app.worker.redis_client") as mock_redis:
+        mock_pipeline = MagicMock()
+        mock_redis.redis.pipeline = MagicMock(return_value=mock_pipeline)
+        mock_pipeline.execute = AsyncMock(return_value=[])
+        mock_redis.redis.hgetall = AsyncMock(return_value={})
+        
+        processed = await process_event("1-0", {
+            "event_type": "page_view",
+            "page_url": "/home",
+            "user_id": "u1",
+            "session_id": "s1",
+            "timestamp": "2024-03-15T12:00:00Z"
+        })
+        
+        assert processed is True
+        s_key = "analytics:session_stats:s1"
+        mock_pipeline.eval.assert_called_once_with(SESSION_BOUNDS_SCRIPT, 1, s_key, 1710504000.0)
+        mock_pipeline.hincrby.assert_any_call(s_key, "pages", 1)
+        mock_pipeline.expire.assert_any_call(s_key, 600)
+
+@pytest.mark.asyncio
+async def test_flush_expired_sessions_writes_sketch_bins():
+    now = 6000.0
+    with patch("app.worker.redis_client") as mock_redis:
+        mock_pipeline = MagicMock()
+        mock_redis.redis.pipeline = MagicMock(return_value=mock_pipeline)
+        mock_pipeline.execute = AsyncMock(side_effect=[
+            [
+                {"first": "1000", "last": "1120", "pages": "4"},
+                {"first": "1500"},                             # single event, no page views
+                {},                                            # stats already expired
+                {"first": "1000", "last": str(now - 10)},      # refreshed after the expiry scan
+            ],
+            [],
+        ])
+        
+        await flush_expired_sessions(["s1", "s2", "s3", "s4"], now)
+        
+        duration_key = "analytics:sketch:session_duration:6000"
+        depth_key = "analytics:sketch:session_depth:6000"
+        mock_pipeline.hincrby.assert_any_call(duration_key, SESSION_SKETCH.bin_for(120), 1)
+        mock_pipeline.hincrby.assert_any_call(depth_key, SESSION_SKETCH.bin_for(4), 1)
+        # Missing "last" means zero duration; missing "pages" means depth 0
+        mock_pipeline.hincrby.assert_any_call(duration_key, SESSION_SKETCH.ZERO_BIN, 1)
+        mock_pipeline.hincrby.assert_any_call(depth_key, SESSION_SKETCH.ZERO_BIN, 1)
+        assert mock_pipeline.hincrby.call_count == 4
+        
+        deleted = [c.args[0] for c in mock_pipeline.delete.call_args_list]
+        assert deleted == ["analytics:session_stats:s1", "analytics:session_stats:s2"]
+        mock_pipeline.zrem.assert_called_once_with("analytics:sessions", "s1", "s2")
+        mock_pipeline.expire.assert_any_call(duration_key, 1200)
+        mock_pipeline.expire.assert_any_call(depth_key, 1200)
+
+@pytest.mark.asyncio
+async def test_process_event_credits_funnel_steps_to_entry_bucket():
+    with patch("app.worker.redis_client") as mock_redis:
+        mock_pipeline = MagicMock()
+        mock_redis.redis.pipeline = MagicMock(return_value=mock_pipeline)
+        mock_pipeline.execute = AsyncMock(return_value=[])
+        # Session entered the checkout funnel (viewed /products) 5 minutes earlier
+        mock_redis.redis.hgetall = AsyncMock(return_value={"checkout": "1", "checkout:start": "1710503700"})
+        
+        await process_event("1-0", {
+            "event_type": "page_view",
+            "page_url": "/cart",
+            "user_id": "u1",
+            "session_id": "s1",
+            "timestamp": "2024-03-15T12:00:00Z"
+        })
+        
+        mock_pipeline.hset.assert_any_call("analytics:funnel_state:s1", mapping={"checkout": 2})
+        mock_pipeline.hincrby.assert_any_call("analytics:funnel:checkout:1710503700", "1", 1)
+
+@pytest.mark.asyncio
+async def test_process_event_records_funnel_entry_bucket():
+    with patch("app.worker.redis_client") as mock_redis:
+        mock_pipeline = MagicMock()
+        mock_redis.redis.pipeline = MagicMock(return_value=mock_pipeline)
+        mock_pipeline.execute = AsyncMock(return_value=[])
+        mock_redis.redis.hgetall = AsyncMock(return_value={})
+        
+        await process_event("1-0", {
+            "event_type": "page_view",
+            "page_url": "/products/shoes",
+            "user_id": "u1",
+            "session_id": "s1",
+            "timestamp": "2024-03-15T12:00:30Z"
+        })
+        
+        mock_pipeline.hset.assert_any_call(
+            "analytics:funnel_state:s1", mapping={"checkout": 1, "checkout:start": 1710504000}
+        )
+        mock_pipeline.hincrby.assert_any_call("analytics:funnel:checkout:1710504000", "0", 1)
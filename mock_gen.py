@@ -47,6 +47,8 @@ def send_event():
     session_id = ACTIVE_SESSIONS[user_id]
     
     event = {
+        # Client-generated id: lets the worker drop duplicates if this event is retried
+        "event_id": str(uuid.uuid4()),
         "event_type": "page_view",
         "page_url": page_url,
         "user_id": user_id,